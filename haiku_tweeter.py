@@ -2,13 +2,16 @@
 import os
 import csv
 import re
+import mmap
 import sqlite3
 import random
-import hashlib
+import functools
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 from dataclasses import dataclass
 from typing import List, Tuple, Optional
 
+import xxhash
 from unidecode import unidecode
 from dotenv import load_dotenv
 
@@ -18,12 +21,108 @@ try:
 except Exception:
     tweepy = None  # allows scanning without Tweepy installed
 
+# NumPy and Numba are optional fast paths: NumPy vectorizes whole-song
+# counting, Numba JIT-compiles the single-line counter on top of it
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None
+try:
+    from numba import njit  # type: ignore
+except Exception:
+    njit = None
+if np is None:
+    njit = None
+
 DB_PATH = os.path.join(os.path.dirname(__file__), "haiku_cache.db")
 
 # ---------------------------- Syllable counting ---------------------------- #
 
 VOWELS = "aeiouy"
 
+# Compiled once at import; per-word re.* calls with string patterns pay for a
+# pattern-cache lookup on every invocation, which adds up in the scan path.
+_ANNOTATION_RE = re.compile(r"[\[\(].*?[\]\)]")
+_WORD_RE = re.compile(r"[A-Za-z']+")
+# Stage cues like [Chorus] and filler like "la la la" fused into one anchored
+# alternation; is_noise_line does a single match on the stripped line
+_NOISE_RE = re.compile(
+    r"[\[\(].*?[\]\)]|(la|na|o+h|yeah|ya|uh)+([ ,\-!?.]*\1)*",
+    re.IGNORECASE,
+)
+
+# Byte-level tables for the per-word hot loop: bytes.translate strips
+# punctuation in C, and the 256-entry mask makes the vowel test a plain index.
+_NON_ALPHA_BYTES = bytes(i for i in range(256) if not ord("a") <= i <= ord("z"))
+_VOWEL_MASK = bytes(1 if chr(i) in VOWELS else 0 for i in range(256))
+_VOWEL_LUT = np.frombuffer(_VOWEL_MASK, np.uint8).astype(bool) if np is not None else None
+
+# Special cases that commonly trip heuristics; built once here instead of as a
+# fresh dict literal on every count_syllables_in_word call
+_SPECIAL_SYLLABLES = {
+    b"queue": 1, b"people": 2, b"choir": 1, b"hour": 1, b"our": 1, b"fire": 1, b"one": 1,
+    b"two": 1, b"once": 1, b"blood": 1, b"breathe": 1, b"breathed": 1, b"every": 2,
+    b"even": 2, b"ever": 2, b"business": 2, b"family": 3, b"poem": 2, b"poet": 2,
+    b"quiet": 2, b"quietly": 3, b"science": 2, b"giant": 2
+}
+
+# Lines containing any of the special-cased words take the per-word path; the
+# JIT kernel only handles the generic rules. Plain substring matching
+# over-triggers (e.g. "your" contains "our") but that only costs speed, never
+# correctness.
+_SPECIAL_HINT_RE = re.compile("|".join(k.decode() for k in _SPECIAL_SYLLABLES))
+
+if njit is not None:
+    @njit(cache=True)
+    def _line_syllables(buf):  # pragma: no cover - compiled
+        """Summed syllable count for a lowercased ASCII line in one pass.
+
+        Mirrors count_syllables_in_word's generic rules: vowel-group
+        transitions per word, trailing silent 'e', '-le' after a consonant,
+        and a minimum of one syllable per word. Apostrophes join words, the
+        same as stripping them from a [A-Za-z']+ token.
+        """
+        total = 0
+        groups = 0
+        alpha_len = 0
+        prev_vowel = 0
+        c1 = 0  # last three letters of the current word, most recent first
+        c2 = 0
+        c3 = 0
+        n = buf.shape[0]
+        for i in range(n + 1):
+            c = buf[i] if i < n else 0
+            if 97 <= c <= 122:
+                v = 1 if (c == 97 or c == 101 or c == 105 or c == 111
+                          or c == 117 or c == 121) else 0
+                groups += v & (prev_vowel ^ 1)
+                prev_vowel = v
+                c3 = c2
+                c2 = c1
+                c1 = c
+                alpha_len += 1
+            elif c == 39:  # apostrophe joins words, as in "don't"
+                pass
+            else:
+                if alpha_len > 0:
+                    if c1 == 101 and c2 != 108 and c2 != 121 and groups > 1:
+                        groups -= 1
+                    if (c1 == 101 and c2 == 108 and alpha_len > 2
+                            and not (c3 == 97 or c3 == 101 or c3 == 105
+                                     or c3 == 111 or c3 == 117 or c3 == 121)):
+                        groups += 1
+                    total += groups if groups > 1 else 1
+                groups = 0
+                alpha_len = 0
+                prev_vowel = 0
+                c1 = 0
+                c2 = 0
+                c3 = 0
+        return total
+else:
+    _line_syllables = None
+
+@functools.lru_cache(maxsize=200_000)
 def count_syllables_in_word(word: str) -> int:
     """Heuristic syllable counter for English words.
     Not perfect, but stable and dependency-free.
@@ -35,46 +134,112 @@ def count_syllables_in_word(word: str) -> int:
       but we leave this to the vowel-group approach.
     - Ensure at least 1 syllable.
     """
-    w = word.lower()
-    w = re.sub(r"[^a-z]", "", w)
+    w = word.lower().encode("ascii", "ignore").translate(None, _NON_ALPHA_BYTES)
 
     if not w:
         return 0
 
-    # Special cases that commonly trip heuristics
-    special = {
-        "queue": 1, "people": 2, "choir": 1, "hour": 1, "our": 1, "fire": 1, "one": 1,
-        "two": 1, "once": 1, "blood": 1, "breathe": 1, "breathed": 1, "every": 2,
-        "even": 2, "ever": 2, "business": 2, "family": 3, "poem": 2, "poet": 2,
-        "quiet": 2, "quietly": 3, "science": 2, "giant": 2
-    }
-    if w in special:
-        return special[w]
+    if w in _SPECIAL_SYLLABLES:
+        return _SPECIAL_SYLLABLES[w]
 
-    # Count vowel groups
-    groups = re.findall(r"[aeiouy]+", w)
-    syllables = len(groups)
+    # Count vowel groups: a consonant->vowel transition starts a group
+    syllables = 0
+    prev = 0
+    for c in w:
+        v = _VOWEL_MASK[c]
+        syllables += v & (prev ^ 1)
+        prev = v
 
     # Trailing silent 'e'
-    if w.endswith("e") and not w.endswith(("le", "ye")) and syllables > 1:
+    if w.endswith(b"e") and not w.endswith((b"le", b"ye")) and syllables > 1:
         syllables -= 1
 
     # 'le' ending after consonant, e.g., "table" -> +1 if not already counted
-    if w.endswith("le") and len(w) > 2 and w[-3] not in VOWELS:
+    if w.endswith(b"le") and len(w) > 2 and not _VOWEL_MASK[w[-3]]:
         syllables += 1
 
     return max(1, syllables)
 
 def count_syllables_in_line(line: str) -> int:
     # Remove annotations like [Chorus], (Verse), etc
-    line = re.sub(r"[\[\(].*?[\]\)]", "", line)
-    line = unidecode(line)
-    words = re.findall(r"[A-Za-z']+", line)
+    line = _ANNOTATION_RE.sub("", line)
+    if not line.isascii():  # unidecode is a no-op on ASCII, but not a free one
+        line = unidecode(line)
+    lowered = line.lower()
+    if _line_syllables is not None and not _SPECIAL_HINT_RE.search(lowered):
+        buf = np.frombuffer(lowered.encode("ascii", "ignore"), np.uint8)
+        return int(_line_syllables(buf))
+    words = _WORD_RE.findall(line)
     return sum(count_syllables_in_word(w) for w in words)
 
+if np is not None:
+    def _line_syllables_bulk(lines: List[str]) -> List[int]:
+        """Per-line syllable counts for a whole song in one vectorized pass.
+
+        The lines are normalised, joined into a single byte buffer (structure
+        of arrays instead of per-word Python objects), and the word
+        boundaries, vowel-group transitions, and ending rules are all
+        computed as NumPy array operations. Lines mentioning a special-cased
+        word are recounted through the per-word path, so the results match
+        count_syllables_in_line exactly.
+        """
+        if not lines:
+            return []
+        norm = []
+        for ln in lines:
+            s = _ANNOTATION_RE.sub("", ln)
+            if not s.isascii():  # transliterate only when actually needed
+                s = unidecode(s)
+            norm.append(s.lower())
+        buf = np.frombuffer("\n".join(norm).encode("ascii", "ignore"), np.uint8)
+        buf = buf[buf != 39]  # drop apostrophes, like stripping them per word
+
+        alpha = (buf >= 97) & (buf <= 122)
+        counts = [0] * len(lines)
+        if alpha.any():
+            vowel = _VOWEL_LUT[buf]
+            prev_alpha = np.empty_like(alpha)
+            prev_alpha[0] = False
+            prev_alpha[1:] = alpha[:-1]
+            next_alpha = np.empty_like(alpha)
+            next_alpha[-1] = False
+            next_alpha[:-1] = alpha[1:]
+            prev_vowel = np.empty_like(vowel)
+            prev_vowel[0] = False
+            prev_vowel[1:] = vowel[:-1]
+
+            ws = np.flatnonzero(alpha & ~prev_alpha)  # word starts
+            we = np.flatnonzero(alpha & ~next_alpha)  # word ends
+            wl = we - ws + 1
+
+            # Vowel groups per word: each consonant->vowel transition starts
+            # one; reduceat sums them over [start_i, start_i+1)
+            groups = np.add.reduceat((vowel & ~prev_vowel).astype(np.int64), ws)
+
+            # Ending rules on the last three letters of each word
+            last = buf[we]
+            second = np.where(wl >= 2, buf[np.maximum(we - 1, 0)], 0)
+            third = np.where(wl >= 3, buf[np.maximum(we - 2, 0)], 0)
+            silent_e = (last == 101) & (second != 108) & (second != 121) & (groups > 1)
+            le_add = (last == 101) & (second == 108) & (wl > 2) & ~_VOWEL_LUT[third]
+            syl = np.maximum(groups - silent_e + le_add, 1)
+
+            line_id = np.searchsorted(np.flatnonzero(buf == 10), ws)
+            counts = np.bincount(line_id, weights=syl,
+                                 minlength=len(lines)).astype(np.int64).tolist()
+
+        # The vector pass only knows the generic rules; recount any line that
+        # may contain a special-cased word
+        for i, s in enumerate(norm):
+            if _SPECIAL_HINT_RE.search(s):
+                counts[i] = sum(count_syllables_in_word(w) for w in _WORD_RE.findall(s))
+        return counts
+else:
+    _line_syllables_bulk = None
+
 # ---------------------------- Haiku detection ----------------------------- #
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Haiku:
     title: str
     artist: str
@@ -86,41 +251,81 @@ class Haiku:
         return "\n".join(self.lines)
 
     def signature(self) -> str:
-        h = hashlib.sha256()
-        h.update(self.title.strip().lower().encode())
-        h.update(self.artist.strip().lower().encode())
-        h.update(self.text.strip().lower().encode())
-        return h.hexdigest()
+        # Identity only, never security: xxh3 is far cheaper than a
+        # cryptographic digest and one formatted string beats three updates
+        key = f"{self.title.strip().lower()}\x00{self.artist.strip().lower()}\x00{self.text.strip().lower()}"
+        return xxhash.xxh3_64_hexdigest(key.encode())
 
 def is_noise_line(line: str) -> bool:
-    if not line.strip():
-        return True
-    # Filter stage cues like [Chorus], [Verse 1], etc
-    if re.search(r"^\s*[\[\(].*?[\]\)]\s*$", line):
-        return True
-    # Often non-lyrical noise like la la la, ooh, yeah repeated
-    if re.fullmatch(r"(la|na|o+h|yeah|ya|uh)+([ ,\-!?.]*\1)*", line.strip().lower()):
-        return True
-    return False
+    s = line.strip()
+    return not s or _NOISE_RE.fullmatch(s) is not None
 
 def find_haikus_in_lyrics(title: str, artist: str, lyrics: str) -> List[Haiku]:
     # Normalise newlines
     raw_lines = [ln.strip() for ln in lyrics.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
     lines = [ln for ln in raw_lines if not is_noise_line(ln)]
 
+    # Cheap prefilter before any counting: a plausible 5- or 7-syllable line
+    # is a handful of words, so lines with one word or more than ~15 are
+    # skipped outright. The sentinel -1 can never match the 5-7-5 pattern.
+    # Each line is still only counted once; the sliding window would
+    # otherwise recount every line up to three times.
+    wc = [ln.count(" ") + 1 for ln in lines]
+    cand = [i for i, c in enumerate(wc) if 2 <= c <= 15]
+    syls = [-1] * len(lines)
+    if _line_syllables_bulk is not None:
+        for i, c in zip(cand, _line_syllables_bulk([lines[i] for i in cand])):
+            syls[i] = c
+    else:
+        for i in cand:
+            syls[i] = count_syllables_in_line(lines[i])
+
+    # The sliding 5-7-5 match is three shifted comparisons; with NumPy those
+    # run as C-level vector ops and Python only touches the (rare) hits
+    if np is not None:
+        arr = np.asarray(syls, dtype=np.int32)
+        hits = np.flatnonzero((arr[:-2] == 5) & (arr[1:-1] == 7) & (arr[2:] == 5))
+    else:
+        hits = [i for i in range(len(lines) - 2)
+                if syls[i] == 5 and syls[i + 1] == 7 and syls[i + 2] == 5]
+
     haikus: List[Haiku] = []
-    for i in range(len(lines) - 2):
-        triplet = lines[i:i+3]
-        sylls = tuple(count_syllables_in_line(ln) for ln in triplet)
-        if sylls == (5, 7, 5):
-            haikus.append(Haiku(title=title, artist=artist, lines=tuple(triplet), syllables=sylls))  # type: ignore
+    for i in hits:
+        haikus.append(Haiku(title=title, artist=artist,
+                            lines=(lines[i], lines[i + 1], lines[i + 2]),
+                            syllables=(5, 7, 5)))
     return haikus
 
 # ---------------------------- Storage (SQLite) ---------------------------- #
 
+_CONN: Optional[sqlite3.Connection] = None
+
+def _conn() -> sqlite3.Connection:
+    """Lazily opened process-wide connection, shared by every DB helper.
+
+    Opening per call rebuilt the page cache and re-ran the pragmas each time.
+    Autocommit mode (isolation_level=None): single-statement helpers commit
+    themselves, and scan_csv opens an explicit transaction for its batch.
+    """
+    global _CONN
+    if _CONN is None:
+        _CONN = sqlite3.connect(DB_PATH, isolation_level=None)
+        # C-implemented row type; lets fetches be read by column name without
+        # positional bookkeeping (indexing still works for e.g. COUNT queries)
+        _CONN.row_factory = sqlite3.Row
+        cur = _CONN.cursor()
+        # WAL batches fsyncs instead of one per commit, and NORMAL sync is
+        # durable enough for a cache we can rebuild from the CSV at any time.
+        # journal_mode persists in the file; the rest are per-connection.
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA cache_size=-65536")  # 64 MiB page cache
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+    return _CONN
+
 def ensure_db():
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
+    cur = _conn().cursor()
     cur.execute(
         """CREATE TABLE IF NOT EXISTS haikus (
                id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -134,35 +339,47 @@ def ensure_db():
                tweeted_at TEXT
            )"""
     )
-    con.commit()
-    con.close()
-
-def cache_haiku(h: Haiku):
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
+    # Dedupe lives in SQL on the identity tuple, so inserts don't need to hash
+    # anything. A separate index (not a table constraint) upgrades old DBs too.
     cur.execute(
-        "INSERT OR IGNORE INTO haikus (sig, title, artist, line1, line2, line3, s1, s2, s3) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        (h.signature(), h.title, h.artist, h.lines[0], h.lines[1], h.lines[2], h.syllables[0], h.syllables[1], h.syllables[2])
+        """CREATE UNIQUE INDEX IF NOT EXISTS idx_haikus_identity
+           ON haikus (title, artist, line1, line2, line3)"""
     )
-    con.commit()
-    con.close()
+
+_INSERT_SQL = (
+    "INSERT OR IGNORE INTO haikus (title, artist, line1, line2, line3, s1, s2, s3) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+def _haiku_row(h: Haiku) -> Tuple:
+    return (h.title, h.artist, h.lines[0], h.lines[1], h.lines[2],
+            h.syllables[0], h.syllables[1], h.syllables[2])
 
 def load_one_unused_haiku() -> Optional[Haiku]:
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
-    cur.execute("SELECT title, artist, line1, line2, line3, s1, s2, s3 FROM haikus WHERE tweeted_at IS NULL ORDER BY RANDOM() LIMIT 1")
+    cur = _conn().cursor()
+    # ORDER BY RANDOM() materializes and sorts every unused row just to keep
+    # one; counting and jumping to a random offset touches far less
+    cur.execute("SELECT COUNT(*) FROM haikus WHERE tweeted_at IS NULL")
+    n = cur.fetchone()[0]
+    if not n:
+        return None
+    cur.execute(
+        "SELECT title, artist, line1, line2, line3, s1, s2, s3 FROM haikus WHERE tweeted_at IS NULL LIMIT 1 OFFSET ?",
+        (random.randrange(n),)
+    )
     row = cur.fetchone()
-    con.close()
     if not row:
         return None
-    return Haiku(title=row[0], artist=row[1], lines=(row[2], row[3], row[4]), syllables=(row[5], row[6], row[7]))
+    return Haiku(title=row["title"], artist=row["artist"],
+                 lines=(row["line1"], row["line2"], row["line3"]),
+                 syllables=(row["s1"], row["s2"], row["s3"]))
 
 def mark_tweeted(h: Haiku):
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
-    cur.execute("UPDATE haikus SET tweeted_at=? WHERE sig=?", (datetime.now(timezone.utc).isoformat(), h.signature()))
-    con.commit()
-    con.close()
+    # Autocommit connection: the UPDATE is durable on its own
+    _conn().execute(
+        "UPDATE haikus SET tweeted_at=? WHERE title=? AND artist=? AND line1=? AND line2=? AND line3=?",
+        (datetime.now(timezone.utc).isoformat(), h.title, h.artist, h.lines[0], h.lines[1], h.lines[2])
+    )
 
 # ---------------------------- Twitter/X posting --------------------------- #
 
@@ -209,18 +426,89 @@ def post_tweet(text: str, client) -> str:
 
 # ---------------------------- CSV scanning ------------------------------- #
 
-def scan_csv(csv_path: str) -> int:
+# Rows buffered before each executemany flush. One commit covers the whole
+# scan: a per-haiku connect/commit/close cycle costs an fsync per row.
+_INSERT_BATCH = 10_000
+
+def _iter_csv_lines(mm, block_size: int = 1 << 20):
+    """Yield decoded lines from a memory-mapped file one large block at a time.
+
+    csv.reader only needs an iterator of physical lines, so rather than
+    text-mode per-line reads we decode a megabyte per call, cut at the last
+    newline (keeping multi-byte UTF-8 sequences whole), and split in memory.
+    The kernel pages the file in on demand.
+    """
+    tail = b""
+    size = len(mm)
+    for off in range(0, size, block_size):
+        block = tail + mm[off:off + block_size]
+        cut = block.rfind(b"\n") + 1
+        if cut == 0:
+            tail = block
+            continue
+        tail = block[cut:]
+        lines = block[:cut].decode("utf-8").split("\n")
+        for ln in lines[:-1]:
+            yield ln + "\n"
+    if tail:
+        yield tail.decode("utf-8")
+
+def _iter_songs(csv_path: str):
+    """Yield (title, artist, lyrics) for each row of the CSV."""
+    with open(csv_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # csv.reader + positional indices: DictReader builds a dict per
+            # row (hashing every column name) but we only read three columns
+            reader = csv.reader(_iter_csv_lines(mm))
+            header = next(reader, None)
+            if header is None:
+                return
+            ti, ai, li = header.index("title"), header.index("artist"), header.index("lyrics")
+            need = max(ti, ai, li) + 1
+            for row in reader:
+                if len(row) < need:  # ragged row; pad like DictReader's None fill
+                    row.extend([""] * (need - len(row)))
+                yield (row[ti] or "Unknown Title", row[ai] or "Unknown Artist", row[li] or "")
+
+def _scan_song(job: Tuple[str, str, str]) -> List[Tuple]:
+    title, artist, lyrics = job
+    return [_haiku_row(h) for h in find_haikus_in_lyrics(title, artist, lyrics)]
+
+def scan_csv(csv_path: str, workers: Optional[int] = None) -> int:
+    """Scan a CSV for haiku and cache them. Songs are independent, so
+    detection fans out across `workers` processes (default: all cores) while
+    the parent keeps the single writer connection and batches the inserts.
+    """
     ensure_db()
+    if workers is None:
+        workers = os.cpu_count() or 1
     found = 0
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            title = row.get("title") or "Unknown Title"
-            artist = row.get("artist") or "Unknown Artist"
-            lyrics = row.get("lyrics") or ""
-            for h in find_haikus_in_lyrics(title, artist, lyrics):
-                cache_haiku(h)
-                found += 1
+    con = _conn()
+    cur = con.cursor()
+    rows: List[Tuple] = []
+    cur.execute("BEGIN")
+    try:
+        jobs = _iter_songs(csv_path)
+        ex = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            batches = ex.map(_scan_song, jobs, chunksize=64) if ex is not None else map(_scan_song, jobs)
+            for batch in batches:
+                rows.extend(batch)
+                found += len(batch)
+                if len(rows) >= _INSERT_BATCH:
+                    cur.executemany(_INSERT_SQL, rows)
+                    rows.clear()
+        finally:
+            if ex is not None:
+                ex.shutdown()
+        if rows:
+            cur.executemany(_INSERT_SQL, rows)
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
     return found
 
 # ---------------------------- CLI ---------------------------------------- #
@@ -232,6 +520,7 @@ def main():
 
     p_scan = sub.add_parser("scan", help="Scan a CSV for haiku and cache them in SQLite")
     p_scan.add_argument("--csv", default="lyrics.csv", help="Path to CSV with columns: title,artist,lyrics")
+    p_scan.add_argument("--workers", type=int, default=None, help="Worker processes for scanning (default: one per core)")
 
     p_tweet = sub.add_parser("tweet", help="Pick one cached haiku and tweet it")
     p_tweet.add_argument("--no-attrib", action="store_true", help="Do not include attribution line")
@@ -243,7 +532,7 @@ def main():
             print(f"CSV not found: {args.csv}")
             print("Tip: copy lyrics_sample.csv to lyrics.csv and try again.")
             return
-        count = scan_csv(args.csv)
+        count = scan_csv(args.csv, workers=args.workers)
         print(f"Scanned {args.csv}. Found and cached {count} haiku triplets.")
         print(f"Database: {DB_PATH}")
         return